@@ -1,8 +1,10 @@
 from __future__ import annotations
 
+import multiprocessing
 import os
 import re
 import threading
+from collections import defaultdict
 from collections.abc import MutableSequence, Sequence
 from typing import NoReturn
 
@@ -26,13 +28,68 @@ _DEFAULT_DAEMONS = {
     "taskworker-scheduler": ["sentry", "run", "taskworker-scheduler"],
 }
 
-_SUBSCRIPTION_RESULTS_CONSUMERS = [
-    "events-subscription-results",
-    "transactions-subscription-results",
-    "generic-metrics-subscription-results",
-    "metrics-subscription-results",
-    "subscription-results-eap-items",
-]
+_DAEMON_ENTRIES: dict[str, tuple[str, tuple[str, ...]]] = {
+    name: (name, tuple(command)) for name, command in _DEFAULT_DAEMONS.items()
+}
+
+_SUBSCRIPTION_RESULTS_CONSUMERS = frozenset(
+    {
+        "events-subscription-results",
+        "transactions-subscription-results",
+        "generic-metrics-subscription-results",
+        "metrics-subscription-results",
+        "subscription-results-eap-items",
+    }
+)
+
+_POST_PROCESS_FORWARDER_CONSUMERS = frozenset(
+    {
+        "post-process-forwarder-errors",
+        "post-process-forwarder-transactions",
+        "post-process-forwarder-issue-platform",
+    }
+)
+
+_METRICS_CONSUMERS = frozenset(
+    {
+        "ingest-metrics",
+        "ingest-generic-metrics",
+        "billing-metrics-consumer",
+    }
+)
+
+_UPTIME_CONSUMERS = frozenset({"uptime-results"})
+
+_RELAY_CONSUMERS = frozenset(
+    {
+        "ingest-events",
+        "ingest-attachments",
+        "ingest-transactions",
+        "ingest-monitors",
+        "ingest-feedback-events",
+        "monitors-clock-tick",
+        "monitors-clock-tasks",
+        "monitors-incident-occurrences",
+    }
+)
+
+_PROFILING_CONSUMERS = frozenset({"ingest-profiles"})
+
+_SPANS_BUFFER_CONSUMERS = frozenset(
+    {
+        "process-spans",
+        "ingest-occurrences",
+        "process-segments",
+    }
+)
+
+_OCCURRENCE_CONSUMERS = frozenset({"ingest-occurrences"})
+
+_CONSUMER_ARGS = (
+    "--consumer-group=sentry-consumer",
+    "--auto-offset-reset=latest",
+    "--no-strict-offset-reset",
+)
 
 
 def add_daemon(name: str, command: list[str]) -> None:
@@ -42,10 +99,11 @@ def add_daemon(name: str, command: list[str]) -> None:
     if name in _DEFAULT_DAEMONS:
         raise KeyError(f"The {name} worker has already been defined")
     _DEFAULT_DAEMONS[name] = command
+    _DAEMON_ENTRIES[name] = (name, tuple(command))
 
 
-def _get_daemon(name: str) -> tuple[str, list[str]]:
-    return name, _DEFAULT_DAEMONS[name]
+def _get_daemon(name: str) -> tuple[str, tuple[str, ...]]:
+    return _DAEMON_ENTRIES[name]
 
 
 @click.command()
@@ -179,11 +237,13 @@ def devserver(
         traces_sample_rate=1.0,
     )
     with sentry_sdk.start_transaction(op="command", name="sentry.devserver"):
+        get_parameter_source = ctx.get_parameter_source
+        params = ctx.params
+        param_names = [p.name for p in ctx.command.params if p.name is not None]
         passed_options = {
-            p.name: ctx.params[p.name]
-            for p in ctx.command.params
-            if p.name is not None
-            and ctx.get_parameter_source(p.name) == click.core.ParameterSource.COMMANDLINE
+            name: params[name]
+            for name in param_names
+            if get_parameter_source(name) == click.core.ParameterSource.COMMANDLINE
         }
 
         for option_name, option_value in passed_options.items():
@@ -211,23 +271,31 @@ def devserver(
             click.echo("WARNING: You have silo=region and webpack enabled. Disabling webpack.")
             watchers = False
 
-        os.environ["SENTRY_ENVIRONMENT"] = environment
+        # Environment changes are collected here and applied in one go before the
+        # server is prepared, so that child processes inherit all of them.
+        env_updates: dict[str, str] = {}
+        env_updates["SENTRY_ENVIRONMENT"] = environment
         # NODE_ENV *must* use production for any prod-like environment as third party libraries look
         # for this magic constant
-        os.environ["NODE_ENV"] = "production" if environment.startswith("prod") else environment
+        env_updates["NODE_ENV"] = "production" if environment.startswith("prod") else environment
 
         # Configure URL prefixes for customer-domains.
         client_host = f"{client_hostname}:{port}"
-        os.environ["SENTRY_SYSTEM_URL_PREFIX"] = f"http://{client_host}"
-        os.environ["SENTRY_SYSTEM_BASE_HOSTNAME"] = client_host
-        os.environ["SENTRY_ORGANIZATION_BASE_HOSTNAME"] = f"{{slug}}.{client_host}"
-        os.environ["SENTRY_ORGANIZATION_URL_TEMPLATE"] = "http://{hostname}"
+        env_updates["SENTRY_SYSTEM_URL_PREFIX"] = f"http://{client_host}"
+        env_updates["SENTRY_SYSTEM_BASE_HOSTNAME"] = client_host
+        env_updates["SENTRY_ORGANIZATION_BASE_HOSTNAME"] = f"{{slug}}.{client_host}"
+        env_updates["SENTRY_ORGANIZATION_URL_TEMPLATE"] = "http://{hostname}"
         if ngrok:
-            os.environ["SENTRY_DEVSERVER_NGROK"] = ngrok
+            env_updates["SENTRY_DEVSERVER_NGROK"] = ngrok
 
         from django.conf import settings
 
-        from sentry.services.http import SentryHTTPServer
+        use_relay = bool(settings.SENTRY_USE_RELAY)
+        use_metrics = settings.SENTRY_USE_METRICS_DEV
+        use_profiling = settings.SENTRY_USE_PROFILING
+        use_spans_buffer = settings.SENTRY_USE_SPANS_BUFFER
+        use_uptime = settings.SENTRY_USE_UPTIME
+        process_subscriptions = settings.SENTRY_DEV_PROCESS_SUBSCRIPTIONS
 
         uwsgi_overrides: dict[str, int | bool | str | None] = {
             "protocol": "http",
@@ -253,12 +321,9 @@ def devserver(
 
         daemons: MutableSequence[tuple[str, Sequence[str]]] = []
         kafka_consumers: set[str] = set()
-        containers: set[str] = set()
-        with get_docker_client() as docker:
-            containers = {c.name for c in docker.containers.list(filters={"status": "running"})}
 
         if experimental_spa:
-            os.environ["SENTRY_UI_DEV_ONLY"] = "1"
+            env_updates["SENTRY_UI_DEV_ONLY"] = "1"
             if not watchers:
                 click.secho(
                     "Using experimental SPA mode without watchers enabled has no effect",
@@ -281,27 +346,27 @@ def devserver(
             ports.pop("webpack")
 
         # Set ports to environment variables so that child processes can read them
-        os.environ["SENTRY_BACKEND_PORT"] = str(ports.get("server"))
         if silo == "region":
-            os.environ["SENTRY_BACKEND_PORT"] = str(ports.get("region.server"))
-
-        server_port = os.environ["SENTRY_BACKEND_PORT"]
+            server_port = str(ports.get("region.server"))
+        else:
+            server_port = str(ports.get("server"))
+        env_updates["SENTRY_BACKEND_PORT"] = server_port
 
         # We proxy all requests through webpacks devserver on the configured port.
         # The backend is served on port+1 and is proxied via the webpack
         # configuration.
         if watchers:
             daemons += settings.SENTRY_WATCHERS
-            os.environ["FORCE_WEBPACK_DEV_SERVER"] = "1"
-            os.environ["SENTRY_WEBPACK_PROXY_HOST"] = str(host)
-            os.environ["SENTRY_WEBPACK_PROXY_PORT"] = str(ports["webpack"])
+            env_updates["FORCE_WEBPACK_DEV_SERVER"] = "1"
+            env_updates["SENTRY_WEBPACK_PROXY_HOST"] = str(host)
+            env_updates["SENTRY_WEBPACK_PROXY_PORT"] = str(ports["webpack"])
 
             # webpack and/or typescript is causing memory issues
-            os.environ["NODE_OPTIONS"] = (
+            env_updates["NODE_OPTIONS"] = (
                 os.environ.get("NODE_OPTIONS", "") + " --max-old-space-size=4096"
             ).lstrip()
 
-        os.environ["SENTRY_USE_RELAY"] = "1" if settings.SENTRY_USE_RELAY else ""
+        env_updates["SENTRY_USE_RELAY"] = "1" if use_relay else ""
 
         if ingest and not workers:
             click.echo("--ingest was provided, implicitly enabling --workers")
@@ -334,45 +399,24 @@ def devserver(
 
             from sentry import eventstream
 
-            if eventstream.backend.requires_post_process_forwarder():
-                kafka_consumers.add("post-process-forwarder-errors")
-                kafka_consumers.add("post-process-forwarder-transactions")
-                kafka_consumers.add("post-process-forwarder-issue-platform")
-
-            daemons.extend([_get_daemon(name) for name in settings.SENTRY_EXTRA_WORKERS])
-
-            if settings.SENTRY_DEV_PROCESS_SUBSCRIPTIONS:
-                kafka_consumers.update(_SUBSCRIPTION_RESULTS_CONSUMERS)
-
-            if settings.SENTRY_USE_METRICS_DEV and settings.SENTRY_USE_RELAY:
-                kafka_consumers.add("ingest-metrics")
-                kafka_consumers.add("ingest-generic-metrics")
-                kafka_consumers.add("billing-metrics-consumer")
-
-            if settings.SENTRY_USE_UPTIME:
-                kafka_consumers.add("uptime-results")
-
-            if settings.SENTRY_USE_RELAY:
-                kafka_consumers.add("ingest-events")
-                kafka_consumers.add("ingest-attachments")
-                kafka_consumers.add("ingest-transactions")
-                kafka_consumers.add("ingest-monitors")
-                kafka_consumers.add("ingest-feedback-events")
-
-                kafka_consumers.add("monitors-clock-tick")
-                kafka_consumers.add("monitors-clock-tasks")
-                kafka_consumers.add("monitors-incident-occurrences")
-
-                if settings.SENTRY_USE_PROFILING:
-                    kafka_consumers.add("ingest-profiles")
-
-                if settings.SENTRY_USE_SPANS_BUFFER:
-                    kafka_consumers.add("process-spans")
-                    kafka_consumers.add("ingest-occurrences")
-                    kafka_consumers.add("process-segments")
-
-            if occurrence_ingest:
-                kafka_consumers.add("ingest-occurrences")
+            daemons.extend(_get_daemon(name) for name in settings.SENTRY_EXTRA_WORKERS)
+
+            consumer_groups = (
+                (
+                    eventstream.backend.requires_post_process_forwarder(),
+                    _POST_PROCESS_FORWARDER_CONSUMERS,
+                ),
+                (process_subscriptions, _SUBSCRIPTION_RESULTS_CONSUMERS),
+                (use_metrics and use_relay, _METRICS_CONSUMERS),
+                (use_uptime, _UPTIME_CONSUMERS),
+                (use_relay, _RELAY_CONSUMERS),
+                (use_relay and use_profiling, _PROFILING_CONSUMERS),
+                (use_relay and use_spans_buffer, _SPANS_BUFFER_CONSUMERS),
+                (occurrence_ingest, _OCCURRENCE_CONSUMERS),
+            )
+            for enabled, consumers in consumer_groups:
+                if enabled:
+                    kafka_consumers |= consumers
 
         # Create all topics if the Kafka eventstream is selected
         if kafka_consumers:
@@ -388,6 +432,13 @@ def devserver(
     Devserver is configured to work with the revamped devservices. Looks like the `{kafka_container_name}` container is not running.
     Please run `devservices up` to start it."""
             )
+            # The daemon treats the name filter as a substring match, so this only
+            # returns the kafka containers rather than everything that is running.
+            with get_docker_client() as docker:
+                containers = {
+                    c.name
+                    for c in docker.containers.list(filters={"status": "running", "name": "kafka"})
+                }
             if not any(name in containers for name in valid_kafka_container_names):
                 raise click.ClickException(
                     f"""
@@ -415,9 +466,15 @@ def devserver(
             from sentry.utils.batching_kafka_consumer import create_topics
             from sentry.utils.kafka_config import get_topic_definition_from_name
 
+            topics_by_cluster: defaultdict[str, list[str]] = defaultdict(list)
             for topic in list_topics():
                 topic_defn = get_topic_definition_from_name(topic)
-                create_topics(topic_defn["cluster"], [topic_defn["real_topic_name"]])
+                topics_by_cluster[topic_defn["cluster"]].append(topic_defn["real_topic_name"])
+
+            # create_topics() builds a new AdminClient on every call, so share one
+            # per cluster rather than one per topic.
+            for cluster, topics in topics_by_cluster.items():
+                create_topics(cluster, topics)
 
             if dev_consumer:
                 daemons.append(
@@ -428,20 +485,7 @@ def devserver(
                 )
             else:
                 for name in kafka_consumers:
-                    daemons.append(
-                        (
-                            name,
-                            [
-                                "sentry",
-                                "run",
-                                "consumer",
-                                name,
-                                "--consumer-group=sentry-consumer",
-                                "--auto-offset-reset=latest",
-                                "--no-strict-offset-reset",
-                            ],
-                        )
-                    )
+                    daemons.append((name, ("sentry", "run", "consumer", name, *_CONSUMER_ARGS)))
 
         # A better log-format for local dev when running through honcho,
         # but if there aren't any other daemons, we don't want to override.
@@ -458,22 +502,24 @@ def devserver(
         # regex pattern string in the list. Docs are here:
         # https://uwsgi-docs.readthedocs.io/en/latest/Options.html?highlight=log-format#log-drain
         if settings.DEVSERVER_REQUEST_LOG_EXCLUDES:
-            filters = settings.DEVSERVER_REQUEST_LOG_EXCLUDES
-            filter_pattern = "|".join(map(lambda s: re.escape(s), filters))
-            uwsgi_overrides["log-drain"] = filter_pattern
-
-        server_port = os.environ["SENTRY_BACKEND_PORT"]
+            uwsgi_overrides["log-drain"] = "|".join(
+                map(re.escape, settings.DEVSERVER_REQUEST_LOG_EXCLUDES)
+            )
 
         if silo == "region":
-            os.environ["SENTRY_SILO_DEVSERVER"] = "1"
-            os.environ["SENTRY_SILO_MODE"] = "REGION"
-            os.environ["SENTRY_REGION"] = "us"
-            os.environ["SENTRY_REGION_SILO_PORT"] = str(server_port)
-            os.environ["SENTRY_CONTROL_SILO_PORT"] = str(ports["server"] + 1)
-            os.environ["SENTRY_DEVSERVER_BIND"] = f"127.0.0.1:{server_port}"
-            os.environ["UWSGI_HTTP_SOCKET"] = f"127.0.0.1:{ports['region.server']}"
-            os.environ["UWSGI_WORKERS"] = "8"
-            os.environ["UWSGI_THREADS"] = "2"
+            env_updates["SENTRY_SILO_DEVSERVER"] = "1"
+            env_updates["SENTRY_SILO_MODE"] = "REGION"
+            env_updates["SENTRY_REGION"] = "us"
+            env_updates["SENTRY_REGION_SILO_PORT"] = str(server_port)
+            env_updates["SENTRY_CONTROL_SILO_PORT"] = str(ports["server"] + 1)
+            env_updates["SENTRY_DEVSERVER_BIND"] = f"127.0.0.1:{server_port}"
+            env_updates["UWSGI_HTTP_SOCKET"] = f"127.0.0.1:{ports['region.server']}"
+            env_updates["UWSGI_WORKERS"] = "8"
+            env_updates["UWSGI_THREADS"] = "2"
+
+        os.environ.update(env_updates)
+
+        from sentry.services.http import SentryHTTPServer
 
         server = SentryHTTPServer(
             host=host,
@@ -495,7 +541,13 @@ def devserver(
         os.environ["PYTHONUNBUFFERED"] = "true"
 
         if debug_server:
-            threading.Thread(target=server.run).start()
+            # honcho wraps every daemon in a multiprocessing.Process. With the
+            # debug server running on a thread in this process, forking those
+            # wrappers could copy locks held by that thread into the children,
+            # so have honcho spawn fresh interpreters instead. This is slower to
+            # start, which is why it is limited to --debug-server.
+            multiprocessing.set_start_method("spawn", force=True)
+            threading.Thread(target=server.run, daemon=True, name="sentry-debug-server").start()
         else:
             # Make sure that the environment is prepared before honcho takes over
             # This sets all the appropriate uwsgi env vars, etc
@@ -506,16 +558,15 @@ def devserver(
 
         cwd = os.path.realpath(os.path.join(settings.PROJECT_ROOT, os.pardir, os.pardir))
 
-        from sentry.runner.formatting import get_honcho_printer
+        # An empty allowlist means every process logs.
+        logs_allowlist = settings.DEVSERVER_LOGS_ALLOWLIST
+        logs_allowlist_set = frozenset(logs_allowlist) if logs_allowlist else None
 
-        honcho_printer = get_honcho_printer(prefix=prefix, pretty=pretty)
+        from sentry.runner.formatting import get_honcho_printer
 
-        manager = Manager(honcho_printer)
+        manager = Manager(get_honcho_printer(prefix=prefix, pretty=pretty))
         for name, cmd in daemons:
-            quiet = bool(
-                name not in (settings.DEVSERVER_LOGS_ALLOWLIST or ())
-                and settings.DEVSERVER_LOGS_ALLOWLIST
-            )
+            quiet = logs_allowlist_set is not None and name not in logs_allowlist_set
             manager.add_process(name, list2cmdline(cmd), quiet=quiet, cwd=cwd)
 
         if silo == "control":
@@ -530,8 +581,7 @@ def devserver(
                 "UWSGI_WORKERS": "8",
                 "UWSGI_THREADS": "2",
             }
-            merged_env = os.environ.copy()
-            merged_env.update(control_environ)
+            merged_env = {**os.environ, **control_environ}
             control_services = ["server"]
             if workers:
                 control_services.append("worker")
@@ -541,10 +591,7 @@ def devserver(
             for service in control_services:
                 name, cmd = _get_daemon(service)
                 name = f"control.{name}"
-                quiet = bool(
-                    name not in (settings.DEVSERVER_LOGS_ALLOWLIST or ())
-                    and settings.DEVSERVER_LOGS_ALLOWLIST
-                )
+                quiet = logs_allowlist_set is not None and name not in logs_allowlist_set
                 manager.add_process(name, list2cmdline(cmd), quiet=quiet, cwd=cwd, env=merged_env)
 
         manager.loop()
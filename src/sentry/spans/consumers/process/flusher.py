@@ -5,6 +5,7 @@ import threading
 import time
 from collections.abc import Callable, Mapping
 from functools import partial
+from operator import attrgetter
 
 import orjson
 import sentry_sdk
@@ -17,7 +18,6 @@ from django.conf import settings
 
 from sentry import options
 from sentry.conf.types.kafka_definition import Topic
-from sentry.processing.backpressure.memory import ServiceMemory
 from sentry.spans.buffer import SpansBuffer
 from sentry.utils import metrics
 from sentry.utils.arroyo import run_with_initialized_sentry
@@ -25,8 +25,23 @@ from sentry.utils.kafka_config import get_kafka_producer_cluster_options, get_to
 
 MAX_PROCESS_RESTARTS = 10
 
+# When there is nothing to flush, the flusher backs off exponentially between
+# these bounds. Segment deadlines have second granularity, so polling Redis
+# much more often than every 100ms only repeats empty queries.
+MIN_IDLE_SLEEP_SECONDS = 0.1
+MAX_IDLE_SLEEP_SECONDS = 1.0
+
+# Segment JSON repeats the same keys for every span and compresses well with
+# zstd. Cluster options take precedence over these.
+PRODUCER_CONFIG_DEFAULTS: Mapping[str, object] = {
+    "compression.type": "zstd",
+    "compression.level": 3,
+}
+
 logger = logging.getLogger(__name__)
 
+_get_payload = attrgetter("payload")
+
 
 class MultiProducer:
     """
@@ -54,7 +69,7 @@ class MultiProducer:
 
     def _default_producer_factory(self, producer_config: Mapping[str, object]) -> KafkaProducer:
         """Default factory that creates real KafkaProducers."""
-        producer_config = dict(producer_config)
+        producer_config = {**PRODUCER_CONFIG_DEFAULTS, **producer_config}
         producer_config["client.id"] = "sentry.spans.consumers.process.flusher"
         return KafkaProducer(build_kafka_producer_configuration(default_config=producer_config))
 
@@ -80,10 +95,10 @@ class MultiProducer:
                 self.topics.append(topic)
         else:
             # Single producer (backward compatibility)
-            cluster_name = get_topic_definition(self.topic)["cluster"]
-            producer_config = get_kafka_producer_cluster_options(cluster_name)
+            topic_definition = get_topic_definition(self.topic)
+            producer_config = get_kafka_producer_cluster_options(topic_definition["cluster"])
             producer = self.producer_factory(producer_config)
-            topic = ArroyoTopic(get_topic_definition(self.topic)["real_topic_name"])
+            topic = ArroyoTopic(topic_definition["real_topic_name"])
 
             self.producers.append(producer)
             self.topics.append(topic)
@@ -136,9 +151,14 @@ class SpanFlusher(ProcessingStrategy[FilteredPayload | int]):
         self.slice_id = buffer.slice_id
 
         self.mp_context = mp_context = multiprocessing.get_context("spawn")
-        self.stopped = mp_context.Value("i", 0)
+        # The shared values are created without a lock. A Synchronized wrapper
+        # only ever guards single loads and stores of `.value`, never a
+        # read-modify-write, so the lock buys nothing for these ints. It would
+        # still cost a semaphore round trip on every access in the flusher
+        # loop and in submit().
+        self.stopped = mp_context.Value("i", 0, lock=False)
         self.redis_was_full = False
-        self.current_drift = mp_context.Value("i", 0)
+        self.current_drift = mp_context.Value("i", 0, lock=False)
         self.produce_to_pipe = produce_to_pipe
 
         # Determine which shards get their own processes vs shared processes
@@ -152,10 +172,12 @@ class SpanFlusher(ProcessingStrategy[FilteredPayload | int]):
 
         self.processes: dict[int, multiprocessing.context.SpawnProcess | threading.Thread] = {}
         self.process_healthy_since = {
-            process_index: mp_context.Value("i", 0) for process_index in range(self.num_processes)
+            process_index: mp_context.Value("i", 0, lock=False)
+            for process_index in range(self.num_processes)
         }
         self.process_backpressure_since = {
-            process_index: mp_context.Value("i", 0) for process_index in range(self.num_processes)
+            process_index: mp_context.Value("i", 0, lock=False)
+            for process_index in range(self.num_processes)
         }
         self.process_restarts = {process_index: 0 for process_index in range(self.num_processes)}
         self.buffers: dict[int, SpansBuffer] = {}
@@ -266,6 +288,8 @@ class SpanFlusher(ProcessingStrategy[FilteredPayload | int]):
                 def produce(payload: KafkaPayload) -> None:
                     producer_futures.append(producer_manager.produce(payload))
 
+            idle_sleep = MIN_IDLE_SLEEP_SECONDS
+
             while not stopped.value:
                 system_now = int(time.time())
                 now = system_now + current_drift.value
@@ -282,22 +306,25 @@ class SpanFlusher(ProcessingStrategy[FilteredPayload | int]):
                 healthy_since.value = system_now
 
                 if not flushed_segments:
-                    time.sleep(1)
+                    time.sleep(idle_sleep)
+                    idle_sleep = min(idle_sleep * 2, MAX_IDLE_SLEEP_SECONDS)
                     continue
 
+                idle_sleep = MIN_IDLE_SLEEP_SECONDS
+
                 with metrics.timer("spans.buffer.flusher.produce", tags={"shard": shard_tag}):
                     for flushed_segment in flushed_segments.values():
                         if not flushed_segment.spans:
                             continue
 
-                        spans = [span.payload for span in flushed_segment.spans]
-                        kafka_payload = KafkaPayload(None, orjson.dumps({"spans": spans}), [])
+                        spans = list(map(_get_payload, flushed_segment.spans))
+                        body = orjson.dumps({"spans": spans})
                         metrics.timing(
                             "spans.buffer.segment_size_bytes",
-                            len(kafka_payload.value),
+                            len(body),
                             tags={"shard": shard_tag},
                         )
-                        produce(kafka_payload)
+                        produce(KafkaPayload(None, body, []))
 
                 with metrics.timer("spans.buffer.flusher.wait_produce", tags={"shards": shard_tag}):
                     for future in producer_futures:
@@ -378,12 +405,10 @@ class SpanFlusher(ProcessingStrategy[FilteredPayload | int]):
         # efforts, it is still always going to be less durable than Kafka.
         # Minimizing our Redis memory usage also makes COGS easier to reason
         # about.
+        now = int(time.time())
         backpressure_secs = options.get("spans.buffer.flusher.backpressure-seconds")
         for backpressure_since in self.process_backpressure_since.values():
-            if (
-                backpressure_since.value > 0
-                and int(time.time()) - backpressure_since.value > backpressure_secs
-            ):
+            if backpressure_since.value > 0 and now - backpressure_since.value > backpressure_secs:
                 metrics.incr("spans.buffer.flusher.backpressure")
                 raise MessageRejected()
 
@@ -391,7 +416,7 @@ class SpanFlusher(ProcessingStrategy[FilteredPayload | int]):
         # If Redis is full for a long time, the drift will grow into a large
         # negative value, effectively pausing flushing as well.
         if isinstance(message.payload, int):
-            self.current_drift.value = drift = message.payload - int(time.time())
+            self.current_drift.value = drift = message.payload - now
             metrics.timing("spans.buffer.flusher.drift", drift)
 
         # We also pause insertion into Redis if Redis is too full. In this case
@@ -400,11 +425,11 @@ class SpanFlusher(ProcessingStrategy[FilteredPayload | int]):
         # wait until the situation is improved manually.
         max_memory_percentage = options.get("spans.buffer.max-memory-percentage")
         if max_memory_percentage < 1.0:
-            memory_infos: list[ServiceMemory] = []
+            used = available = 0
             for buffer in self.buffers.values():
-                memory_infos.extend(buffer.get_memory_info())
-            used = sum(x.used for x in memory_infos)
-            available = sum(x.available for x in memory_infos)
+                for memory_info in buffer.get_memory_info():
+                    used += memory_info.used
+                    available += memory_info.available
             if available > 0 and used / available > max_memory_percentage:
                 if not self.redis_was_full:
                     logger.fatal("Pausing consumer due to Redis being full")
@@ -437,15 +462,17 @@ class SpanFlusher(ProcessingStrategy[FilteredPayload | int]):
 
         self.next_step.join(timeout)
 
-        # Wait for all processes to finish
+        # Wait for all processes to finish. join() blocks on the process
+        # sentinel (or the thread's lock), so we wake up as soon as the worker
+        # exits instead of polling is_alive().
         for process_index, process in self.processes.items():
+            remaining_time = None
             if deadline is not None:
                 remaining_time = deadline - time.time()
                 if remaining_time <= 0:
                     break
 
-            while process.is_alive() and (deadline is None or deadline > time.time()):
-                time.sleep(0.1)
+            process.join(remaining_time)
 
             if isinstance(process, multiprocessing.Process):
                 process.terminate()
@@ -9,8 +9,12 @@ from arroyo.processing.strategies.noop import Noop
 from django.test import override_settings
 
 from sentry.conf.types.kafka_definition import Topic
-from sentry.spans.buffer import Span, SpansBuffer
-from sentry.spans.consumers.process.flusher import MultiProducer, SpanFlusher
+from sentry.spans.buffer import FlushedSegment, OutputSpan, Span, SpansBuffer
+from sentry.spans.consumers.process.flusher import (
+    PRODUCER_CONFIG_DEFAULTS,
+    MultiProducer,
+    SpanFlusher,
+)
 from sentry.testutils.helpers.options import override_options
 from tests.sentry.spans.test_buffer import DEFAULT_OPTIONS
 
@@ -188,3 +192,59 @@ def test_flusher_waits_for_processes_to_start() -> None:
             next_step=Noop(),
             produce_to_pipe=lambda _: None,
         )
+
+
+def test_default_producer_factory_merges_cluster_options() -> None:
+    manager = MultiProducer(Topic.BUFFERED_SEGMENTS, producer_factory=lambda _: mock.Mock())
+
+    with (
+        mock.patch(
+            "sentry.spans.consumers.process.flusher.build_kafka_producer_configuration",
+            side_effect=lambda default_config: default_config,
+        ),
+        mock.patch("sentry.spans.consumers.process.flusher.KafkaProducer") as kafka_producer,
+    ):
+        manager._default_producer_factory(
+            {"bootstrap.servers": "kafka:9092", "compression.type": "lz4"}
+        )
+
+    (config,), _ = kafka_producer.call_args
+    assert config["bootstrap.servers"] == "kafka:9092"
+    # Cluster options win over the flusher's defaults
+    assert config["compression.type"] == "lz4"
+    assert config["compression.level"] == PRODUCER_CONFIG_DEFAULTS["compression.level"]
+    assert config["client.id"] == "sentry.spans.consumers.process.flusher"
+
+
+def test_flusher_backs_off_when_idle() -> None:
+    segments = {
+        b"segment": FlushedSegment(
+            queue_key=b"queue", spans=[OutputSpan(payload={"span_id": "a" * 16})]
+        )
+    }
+    buffer = mock.Mock(any_shard_at_limit=False)
+    buffer.flush_segments.side_effect = [{}] * 6 + [segments, {}]
+
+    stopped = mock.Mock(value=0)
+    sleeps: list[float] = []
+
+    def sleep(seconds: float) -> None:
+        sleeps.append(seconds)
+        if len(sleeps) == 7:
+            stopped.value = 1
+
+    messages: list[Any] = []
+    with mock.patch("time.sleep", side_effect=sleep):
+        SpanFlusher.main(
+            buffer,
+            [0],
+            stopped,
+            mock.Mock(value=0),
+            mock.Mock(value=0),
+            mock.Mock(value=0),
+            messages.append,
+        )
+
+    assert sleeps == [0.1, 0.2, 0.4, 0.8, 1.0, 1.0, 0.1]
+    assert len(messages) == 1
+    buffer.done_flush_segments.assert_called_once_with(segments)